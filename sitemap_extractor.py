@@ -1,49 +1,310 @@
 import requests
-import xml.etree.ElementTree as ET
-from typing import Set, List
+from requests.adapters import HTTPAdapter
+from xml.parsers import expat
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Deque, Dict, Iterator, Set, List, Tuple
+import gzip
+import heapq
+import itertools
+import queue
+import tempfile
+import threading
 import os
 import datetime # For timestamp if needed, though less critical for batch files
 
-def get_sitemap_urls(sitemap_url: str, all_urls: Set[str], processed_sitemaps: Set[str]) -> None:
+MAX_CONCURRENT_FETCHES = 16 # Worker threads (and pooled connections) downloading sitemaps
+FETCH_CHUNK_SIZE = 64 * 1024 # Bytes handed to the XML parser at a time
+WRITE_BUFFER_SIZE = 1 << 20 # 1 MiB buffer for the generated Markdown files
+BATCH_WRITE_WORKERS = 8 # Threads writing batch files concurrently
+MAX_PENDING_BATCH_WRITES = BATCH_WRITE_WORKERS * 2 # Batches queued for writing before the merge waits
+URL_RUN_SIZE = 50_000 # URLs held in memory before a sorted run is spilled to disk
+
+# <loc> with and without the sitemap namespace, as reported by expat with a ' ' namespace separator
+LOC_TAGS = frozenset({'http://www.sitemaps.org/schemas/sitemap/0.9 loc', 'loc'})
+
+BATCH_HEADER_TEMPLATE = (
+    "# Incontri Italia - Link Batch {batch_number:03d}\n\n"
+    "This file contains a curated selection of pages from [incontri-italia.it](https://www.incontri-italia.it/), part of a larger collection.\n\n"
+    "See the [main index](../{readme_filename}) for a full list of batches.\n\n"
+    "## Links in this Batch\n\n"
+)
+
+CONSOLIDATED_FILENAME = "links.md.gz"
+CONSOLIDATED_HEADER = (
+    "# Incontri Italia - All Links\n\n"
+    "Every curated page from [incontri-italia.it](https://www.incontri-italia.it/), grouped into batches.\n\n"
+)
+
+class UrlSet:
     '''
-    Recursively fetches and parses sitemaps to extract all unique URLs.
+    Collects unique URLs in bounded sorted runs. Within a run, URLs are grouped by everything
+    up to their last '/', so each shared prefix is stored once and only the final path segment
+    is kept per URL. Once a run holds URL_RUN_SIZE URLs it is sorted and spilled to a temporary
+    file, keeping memory flat however large the sitemap is.
+
+    add() is safe to call from several threads. A full run is detached under the internal lock
+    but sorted and written outside it, so other callers aren't held up by the disk write; any
+    error from the spill propagates to the caller of add().
     '''
-    if sitemap_url in processed_sitemaps:
-        print(f"Skipping already processed sitemap: {sitemap_url}")
-        return
+    def __init__(self, run_size: int = URL_RUN_SIZE) -> None:
+        self._run_size = run_size
+        self._suffixes_by_prefix: Dict[str, Set[str]] = {}
+        self._run_length = 0
+        self._spilled_runs: List[IO[str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, url: str) -> None:
+        prefix, separator, suffix = url.rpartition('/')
+        with self._lock:
+            suffixes = self._suffixes_by_prefix.setdefault(prefix + separator, set())
+            if suffix in suffixes:
+                return
+            suffixes.add(suffix)
+            self._run_length += 1
+            if self._run_length < self._run_size:
+                return
+            full_run = self._suffixes_by_prefix
+            self._suffixes_by_prefix = {}
+            self._run_length = 0
+        self._spill_run(full_run)
+
+    def __bool__(self) -> bool:
+        return self._run_length > 0 or bool(self._spilled_runs)
 
-    print(f"Processing sitemap: {sitemap_url}")
-    processed_sitemaps.add(sitemap_url)
+    @staticmethod
+    def _sorted_run(suffixes_by_prefix: Dict[str, Set[str]]) -> List[str]:
+        return sorted(prefix + suffix for prefix, suffixes in suffixes_by_prefix.items() for suffix in suffixes)
 
-    try:
-        response = requests.get(sitemap_url, timeout=10)
+    def _spill_run(self, suffixes_by_prefix: Dict[str, Set[str]]) -> None:
+        run_file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        try:
+            run_file.writelines(f"{url}\n" for url in self._sorted_run(suffixes_by_prefix))
+            run_file.seek(0)
+        except BaseException:
+            run_file.close()
+            raise
+        with self._lock:
+            self._spilled_runs.append(run_file)
+
+    def drain_sorted(self) -> Iterator[str]:
+        '''
+        Yields every unique URL in sorted order by merging the spilled runs with the one still
+        in memory. Duplicates that landed in different runs are dropped here. Single use: the
+        collector is emptied and its temporary files are closed once the stream is exhausted.
+        '''
+        runs: List[Iterator[str]] = [(line.rstrip('\n') for line in run_file) for run_file in self._spilled_runs]
+        runs.append(iter(self._sorted_run(self._suffixes_by_prefix)))
+        self._suffixes_by_prefix = {}
+        self._run_length = 0
+        try:
+            previous_url = None
+            for url in heapq.merge(*runs):
+                if url != previous_url:
+                    yield url
+                    previous_url = url
+        finally:
+            for run_file in self._spilled_runs:
+                run_file.close()
+            self._spilled_runs = []
+
+def create_session() -> requests.Session:
+    '''
+    Builds the client session shared by every fetch, so connections (and their TLS
+    handshakes) are pooled and kept alive across sitemaps instead of redone per request.
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_FETCHES, pool_maxsize=MAX_CONCURRENT_FETCHES)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip'
+    return session
+
+def fetch(session: requests.Session, url: str) -> Iterator[bytes]:
+    '''
+    Downloads a single sitemap, yielding its (decompressed) body in chunks as they arrive.
+    '''
+    with session.get(url, timeout=10, stream=True) as response:
         response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching sitemap {sitemap_url}: {e}")
-        return
-
-    try:
-        namespaces = {'sitemap': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        content = response.content.strip()
-        if not content:
-            print(f"Sitemap is empty: {sitemap_url}")
+        yield from response.iter_content(FETCH_CHUNK_SIZE)
+
+def create_loc_parser(locs: List[str]) -> expat.XMLParserType:
+    '''
+    Builds a streaming expat parser that appends the text of every <loc> element to locs.
+    Only <loc> text is needed, so no element tree is ever built.
+    '''
+    parser = expat.ParserCreate(namespace_separator=' ')
+    parser.buffer_text = True
+    text_parts: List[str] = []
+    in_loc = False
+
+    def start_element(name: str, attrs: Dict[str, str]) -> None:
+        nonlocal in_loc
+        if name in LOC_TAGS:
+            in_loc = True
+            text_parts.clear()
+
+    def end_element(name: str) -> None:
+        nonlocal in_loc
+        if name in LOC_TAGS:
+            in_loc = False
+            locs.append(''.join(text_parts).strip())
+
+    def character_data(data: str) -> None:
+        if in_loc:
+            text_parts.append(data)
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    return parser
+
+def get_sitemap_urls(session: requests.Session, sitemap_url: str, all_urls: UrlSet, processed_sitemaps: Set[str]) -> None:
+    '''
+    Concurrently fetches and parses sitemaps to extract all unique URLs.
+    Child sitemaps are pushed onto a shared work stack drained by a pool of worker threads;
+    the network reads release the GIL, so downloads overlap. No recursion is involved, so
+    arbitrarily deep sitemap indexes can't hit the recursion limit.
+    '''
+    # LIFO biases the traversal toward depth-first, like the old recursive version. With several
+    # workers it is only a bias: siblings already taken keep running alongside the children.
+    pending: queue.LifoQueue = queue.LifoQueue()
+    pending.put(sitemap_url)
+    lock = threading.Lock() # Guards processed_sitemaps; all_urls does its own locking
+    # Set when the caller is interrupted (e.g. Ctrl-C): workers stop fetching and queuing
+    # children, and just drain the queue until they reach a sentinel
+    stop_requested = threading.Event()
+
+    def process(url: str) -> None:
+        if stop_requested.is_set():
+            return
+        with lock:
+            if url in processed_sitemaps:
+                print(f"Skipping already processed sitemap: {url}")
+                return
+            processed_sitemaps.add(url)
+
+        print(f"Processing sitemap: {url}")
+
+        locs: List[str] = []
+        try:
+            # Chunks go to the parser untouched as they arrive; no copy or strip of the body.
+            # A whitespace-only body is left for the parser to reject.
+            parser = create_loc_parser(locs)
+            received_body = False
+            for chunk in fetch(session, url):
+                if stop_requested.is_set():
+                    return
+                received_body = True
+                parser.Parse(chunk, False)
+            if not received_body:
+                print(f"Sitemap is empty: {url}")
+                return
+            parser.Parse(b'', True)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching sitemap {url}: {e}")
             return
-        root = ET.fromstring(content)
-        loc_elements = root.findall('.//sitemap:loc', namespaces)
-        if not loc_elements:
-            loc_elements = root.findall('.//loc')
-
-        for loc_element in loc_elements:
-            if loc_element.text:
-                url = loc_element.text.strip()
-                if url.endswith('.xml'):
-                    get_sitemap_urls(url, all_urls, processed_sitemaps)
-                else:
-                    all_urls.add(url)
-    except ET.ParseError as e:
-        print(f"Error parsing XML from {sitemap_url}: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred while processing {sitemap_url}: {e}")
+        except expat.ExpatError as e:
+            print(f"Error parsing XML from {url}: {e}")
+            return
+        except Exception as e:
+            print(f"An unexpected error occurred while processing {url}: {e}")
+            return
+
+        # A failing add() (e.g. a run spill hitting a full disk) propagates to the worker,
+        # which records it so get_sitemap_urls raises once the queue has drained
+        for loc in locs:
+            if stop_requested.is_set():
+                return
+            if not loc:
+                continue
+            if loc.endswith('.xml'):
+                pending.put(loc)
+            else:
+                all_urls.add(loc)
+
+    failures: List[Tuple[str, Exception]] = []
+
+    def worker() -> None:
+        while True:
+            url = pending.get()
+            try:
+                if url is None: # Sentinel: the queue has been drained
+                    return
+                process(url)
+            except Exception as e:
+                # Keep the thread alive so the queue still drains; the failure is re-raised below
+                print(f"Failed to process sitemap {url}: {e!r}")
+                failures.append((url, e))
+            finally:
+                pending.task_done()
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES) as executor:
+        worker_futures = [executor.submit(worker) for _ in range(MAX_CONCURRENT_FETCHES)]
+        try:
+            pending.join()
+        except BaseException:
+            # Sentinels alone can't stop the crawl: the queue is LIFO, so a worker finishing
+            # mid-flight could still push children above them
+            stop_requested.set()
+            raise
+        finally:
+            for _ in range(MAX_CONCURRENT_FETCHES):
+                pending.put(None)
+        for future in worker_futures:
+            future.result() # Surfaces anything that escaped a worker's own handling
+
+    if failures:
+        # The extracted URL set is incomplete, so don't let the caller write partial output
+        failed_url, error = failures[0]
+        raise RuntimeError(f"{len(failures)} sitemap(s) failed to process, first: {failed_url}") from error
+
+def iter_batches(urls: Iterator[str], batch_size: int) -> Iterator[List[str]]:
+    '''
+    Cuts a (sorted) URL stream into consecutive batches of at most batch_size URLs.
+    '''
+    while True:
+        batch_urls = list(itertools.islice(urls, batch_size))
+        if not batch_urls:
+            return
+        yield batch_urls
+
+def link_lines(batch_urls: List[str]) -> Iterator[str]:
+    '''
+    Yields the Markdown list item for each URL. The link text is whatever follows the
+    last '//'; rpartition avoids split()'s per-URL list.
+    '''
+    for url in batch_urls:
+        yield f"- [{url.rpartition('//')[2]}]({url})\n"
+
+def write_batch(batch_number: int, batch_urls: List[str], lists_path: str, lists_subdir: str, readme_filename: str) -> Tuple[str, str]:
+    '''
+    Writes one Markdown batch file and returns its (display_name, relative_path) for the README.
+    '''
+    # Pad with leading zeros for consistent sorting if many files (e.g., 001, 002, ... 010, 011)
+    batch_filename = f"list-{batch_number:03d}.md"
+    batch_filepath = os.path.join(lists_path, batch_filename)
+
+    # Store relative path for the main README.md
+    relative_batch_path = f"{lists_subdir}/{batch_filename}" # Forward slashes for MD links, whatever the OS
+    batch_display_name = f"Link Batch {batch_number:03d}"
+
+    # Assemble the whole file body first so each batch file is a single write
+    batch_parts = [BATCH_HEADER_TEMPLATE.format(batch_number=batch_number, readme_filename=readme_filename)]
+    batch_parts.extend(link_lines(batch_urls))
+    with open(batch_filepath, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as bf:
+        bf.write(''.join(batch_parts))
+    print(f"Successfully wrote {len(batch_urls)} URLs to {batch_filepath}")
+    return batch_display_name, relative_batch_path
+
+def write_consolidated_batch(cf: IO[str], batch_number: int, batch_urls: List[str]) -> None:
+    '''
+    Appends one batch as a '## Batch NNN' section of the consolidated file.
+    '''
+    batch_parts = [f"## Batch {batch_number:03d}\n\n"]
+    batch_parts.extend(link_lines(batch_urls))
+    batch_parts.append("\n")
+    cf.write(''.join(batch_parts))
 
 if __name__ == "__main__":
     initial_sitemap_url = "https://www.incontri-italia.it/sitemap.xml"
@@ -53,6 +314,10 @@ if __name__ == "__main__":
     lists_subdir = "lists"  # Subdirectory for batched link files
     batch_size = 150      # Number of URLs per batch file (e.g., 50-100)
     readme_filename = "README.md" # Main index file for the repo
+    # Write every batch into a single lists/links.md.gz instead of one file per batch. Output from the
+    # other mode is removed (old list-NNN.md files here, a leftover links.md.gz in per-file mode);
+    # note update_sitemap.py only advertises .md files, not links.md.gz.
+    consolidated_output = False
     # ----
 
     # Create base directory and lists subdirectory if they don't exist
@@ -60,46 +325,61 @@ if __name__ == "__main__":
     os.makedirs(full_lists_path, exist_ok=True)
     print(f"Output directory structure will be created in: {os.path.abspath(output_base_dir)}")
 
-    extracted_urls: Set[str] = set()
+    extracted_urls = UrlSet()
     processed_sitemap_links: Set[str] = set()
 
     print(f"Starting extraction from: {initial_sitemap_url}")
-    get_sitemap_urls(initial_sitemap_url, extracted_urls, processed_sitemap_links)
-    print(f"\nExtraction complete. Found {len(extracted_urls)} unique URLs.")
+    with create_session() as session:
+        get_sitemap_urls(session, initial_sitemap_url, extracted_urls, processed_sitemap_links)
+    print("\nExtraction complete.")
 
     if not extracted_urls:
         print("No URLs were extracted. Halting further processing.")
     else:
-        sorted_urls = sorted(list(extracted_urls))
-        batch_files_details = [] # To store (display_name, relative_path) for README
-        num_batches = (len(sorted_urls) + batch_size - 1) // batch_size
+        # Batches are cut straight from the merged sorted stream; the full URL list is never built
+        batches = iter_batches(extracted_urls.drain_sorted(), batch_size)
+        total_urls = 0
 
-        print(f"Preparing to write URLs into {num_batches} batch files...")
+        if consolidated_output:
+            # One gzip-compressed file, trading thousands of small file creations for a single sequential write
+            consolidated_filepath = os.path.join(full_lists_path, CONSOLIDATED_FILENAME)
+            print(f"Writing URLs in batches of {batch_size} into {consolidated_filepath}...")
+            with gzip.open(consolidated_filepath, 'wt', encoding='utf-8', compresslevel=1) as cf:
+                cf.write(CONSOLIDATED_HEADER)
+                for batch_number, batch_urls in enumerate(batches, start=1):
+                    write_consolidated_batch(cf, batch_number, batch_urls)
+                    total_urls += len(batch_urls)
+            print(f"Successfully wrote {total_urls} URLs to {consolidated_filepath}")
 
-        for i in range(num_batches):
-            batch_start_index = i * batch_size
-            batch_end_index = batch_start_index + batch_size
-            current_batch_urls = sorted_urls[batch_start_index:batch_end_index]
-            
-            batch_file_number = i + 1
-            # Pad with leading zeros for consistent sorting if many files (e.g., 001, 002, ... 010, 011)
-            batch_filename = f"list-{batch_file_number:03d}.md" 
-            batch_filepath = os.path.join(full_lists_path, batch_filename)
-            
-            # Store relative path for the main README.md
-            relative_batch_path = os.path.join(lists_subdir, batch_filename).replace('\\\\', '/') # Ensure forward slashes for MD links
-            batch_display_name = f"Link Batch {batch_file_number:03d}"
-            batch_files_details.append((batch_display_name, relative_batch_path))
-
-            with open(batch_filepath, 'w', encoding='utf-8') as bf:
-                bf.write(f"# Incontri Italia - Link Batch {batch_file_number:03d}\\n\\n")
-                bf.write(f"This file contains a curated selection of pages from [incontri-italia.it](https://www.incontri-italia.it/), part of a larger collection.\\n\\n")
-                bf.write(f"See the [main index](../{readme_filename}) for a full list of batches.\\n\\n") 
-                bf.write("## Links in this Batch\\n\\n")
-                for url in current_batch_urls:
-                    link_text = url.split('//')[-1] # Basic link text
-                    bf.write(f"- [{link_text}]({url})\n")
-            print(f"Successfully wrote {len(current_batch_urls)} URLs to {batch_filepath}")
+            # Batch files left over from earlier per-file runs would otherwise linger in the
+            # lists directory and keep being advertised by update_sitemap.py
+            with os.scandir(full_lists_path) as it:
+                for entry in it:
+                    if entry.name.startswith("list-") and entry.name.endswith(".md") and entry.is_file():
+                        os.remove(entry.path)
+                        print(f"Removed stale batch file: {entry.path}")
+            batch_files_details = [("All Links (gzip-compressed)", f"{lists_subdir}/{CONSOLIDATED_FILENAME}")]
+        else:
+            print(f"Writing URLs into batch files of {batch_size}...")
+
+            # Batches are independent, so their files are written in parallel; results are
+            # collected in submission order to keep the README order. The merge outruns the
+            # writers, so at most MAX_PENDING_BATCH_WRITES batches are held in memory at once.
+            batch_files_details = []
+            with ThreadPoolExecutor(max_workers=BATCH_WRITE_WORKERS) as executor:
+                batch_futures: Deque[Future] = deque()
+                for batch_number, batch_urls in enumerate(batches, start=1):
+                    if len(batch_futures) >= MAX_PENDING_BATCH_WRITES:
+                        batch_files_details.append(batch_futures.popleft().result())
+                    batch_futures.append(executor.submit(write_batch, batch_number, batch_urls, full_lists_path, lists_subdir, readme_filename))
+                    total_urls += len(batch_urls)
+                batch_files_details.extend(future.result() for future in batch_futures)
+
+            # A consolidated file from an earlier run is no longer linked from the README
+            stale_consolidated_filepath = os.path.join(full_lists_path, CONSOLIDATED_FILENAME)
+            if os.path.isfile(stale_consolidated_filepath):
+                os.remove(stale_consolidated_filepath)
+                print(f"Removed stale consolidated file: {stale_consolidated_filepath}")
 
         # --- Create the main README.md ---
         readme_filepath = os.path.join(output_base_dir, readme_filename)
@@ -117,7 +397,10 @@ if __name__ == "__main__":
             rf.write("Please replace the placeholder text above with your detailed website description!\n\n")
 
             rf.write("## Explore Our Link Collections\n\n")
-            rf.write("Below is a directory of Markdown files, each containing a batch of URLs from our website:\n\n")
+            if consolidated_output:
+                rf.write("Below is a single gzip-compressed Markdown file containing every batch of URLs from our website:\n\n")
+            else:
+                rf.write("Below is a directory of Markdown files, each containing a batch of URLs from our website:\n\n")
             if batch_files_details:
                 for display_name, path_to_file in batch_files_details:
                     rf.write(f"- [{display_name}]({path_to_file})\n")
@@ -132,7 +415,7 @@ if __name__ == "__main__":
             rf.write("For the complete and most up-to-date experience, please visit our main website: **[incontri-italia.it](https://www.incontri-italia.it/)**\n")
 
         print(f"Successfully created {readme_filename} with links to {len(batch_files_details)} batch files.")
-        print(f"\nTotal unique URLs processed: {len(sorted_urls)}")
+        print(f"\nTotal unique URLs processed: {total_urls}")
         print(f"Total sitemaps processed: {len(processed_sitemap_links)}")
         print(f"Output generated in directory: {os.path.abspath(output_base_dir)}")
         print("\nNext Steps for GitHub Pages:")
@@ -1,54 +1,64 @@
 import os
 import datetime
 
+SITEMAP_HEADER = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+"""
+SITEMAP_FOOTER = b"</urlset>\n"
+ENTRY_TEMPLATE = """  <url>
+    <loc>{loc}</loc>
+    <lastmod>{lastmod}</lastmod>
+    <changefreq>{changefreq}</changefreq>
+    <priority>{priority}</priority>
+  </url>
+"""
+
 def generate_sitemap_entries():
+    '''
+    Yields (loc, lastmod, changefreq, priority) tuples for the main page and every batch file.
+    '''
     base_url = "https://whik59140.github.io/links-italia"
     lists_dir = "lists"
-    sitemap_entries = []
+    today_iso = datetime.date.today().isoformat() # Computed once; reused by the fallback below
 
     # Main page entry
-    sitemap_entries.append(f"""  <url>
-    <loc>{base_url}/</loc>
-    <lastmod>{datetime.date.today().isoformat()}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>1.0</priority>
-  </url>""")
+    yield f"{base_url}/", today_iso, "weekly", "1.0"
 
     # Entries for files in the lists directory
     if os.path.exists(lists_dir) and os.path.isdir(lists_dir):
-        for filename in os.listdir(lists_dir):
-            if filename.endswith(".md"):
-                filepath = os.path.join(lists_dir, filename)
+        # scandir's is_file() answers from the directory entry's type (d_type), without an extra
+        # stat(). On Windows the scan also caches the mtime; on POSIX entry.stat() still costs
+        # one syscall per file, same as getmtime()
+        with os.scandir(lists_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".md") or not entry.is_file():
+                    continue
                 try:
                     # Get last modification time
-                    mtime = os.path.getmtime(filepath)
+                    mtime = entry.stat().st_mtime
                     lastmod_date = datetime.date.fromtimestamp(mtime).isoformat()
                 except Exception:
                     # Fallback to today\'s date if mtime fails
-                    lastmod_date = datetime.date.today().isoformat()
-                
+                    lastmod_date = today_iso
+
                 # Ensure forward slashes for URL
-                loc_path = f"{base_url}/{lists_dir}/{filename}".replace("\\\\", "/")
+                loc_path = f"{base_url}/{lists_dir}/{entry.name}".replace("\\\\", "/")
 
-                sitemap_entries.append(f"""  <url>
-    <loc>{loc_path}</loc>
-    <lastmod>{lastmod_date}</lastmod>
-    <changefreq>monthly</changefreq>
-    <priority>0.8</priority>
-  </url>""")
+                yield loc_path, lastmod_date, "monthly", "0.8"
     else:
         print(f"Warning: Directory \'{lists_dir}\' not found.")
 
-    return sitemap_entries
-
 def write_sitemap(entries):
-    sitemap_content = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-{os.linesep.join(entries)}
-</urlset>
-"""
+    '''
+    Encodes each entry into one growing bytearray and writes it to sitemap.xml in binary mode,
+    bypassing the text-IO layer.
+    '''
+    sitemap_content = bytearray(SITEMAP_HEADER)
+    for loc, lastmod, changefreq, priority in entries:
+        sitemap_content += ENTRY_TEMPLATE.format(loc=loc, lastmod=lastmod, changefreq=changefreq, priority=priority).encode("utf-8")
+    sitemap_content += SITEMAP_FOOTER
     try:
-        with open("sitemap.xml", "w", encoding="utf-8") as f:
+        with open("sitemap.xml", "wb") as f:
             f.write(sitemap_content)
         print("sitemap.xml has been successfully updated.")
         # Verify by printing the first few lines of the generated sitemap
@@ -64,8 +74,5 @@ def write_sitemap(entries):
         print(f"Error writing sitemap.xml: {e}")
 
 if __name__ == "__main__":
-    generated_entries = generate_sitemap_entries()
-    if generated_entries:
-        write_sitemap(generated_entries)
-    else:
-        print("No sitemap entries were generated.") 
\ No newline at end of file
+    # The main page entry is always present, so there is always something to write
+    write_sitemap(generate_sitemap_entries())